@@ -15,11 +15,45 @@ __version__ = '0.4.6'
 __license__ = 'MIT'
 
 import asyncio
+import importlib
 import os
+from typing import TYPE_CHECKING
 
 from .enums import OCRFormat, OCRLanguage, T2IQuality, T2ISize, T2ITheme
-from .image_models import BackgroundRemovedImage, ColorizeResult, EnhancedImage, OCRResult, T2IResult
-from .main import EnhancedImage, PicWish, PicwishError
+
+if TYPE_CHECKING:
+    from .image_models import BackgroundRemovedImage, ColorizeResult, EnhancedImage, OCRResult, T2IResult
+    from .main import PicWish, PicwishError
+
+# Submodules that pull in the HTTP stack are imported on first attribute access
+_lazy_imports = {
+    'BackgroundRemovedImage': '.image_models',
+    'ColorizeResult': '.image_models',
+    'EnhancedImage': '.image_models',
+    'OCRResult': '.image_models',
+    'T2IResult': '.image_models',
+    'PicWish': '.main',
+    'PicwishError': '.main'
+}
+
+__all__ = [
+    'OCRFormat', 'OCRLanguage', 'T2IQuality', 'T2ISize', 'T2ITheme',
+    *_lazy_imports
+]
+
+
+def __getattr__(name: str):
+    module = _lazy_imports.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_lazy_imports})
+
 
 if os.name == 'nt':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
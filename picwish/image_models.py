@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass, field
 from pathlib import Path
 
@@ -6,38 +7,71 @@ from httpx import AsyncClient
 from .enums import OCRFormat
 
 
-@dataclass
+@dataclass(slots=True)
 class BaseImage:
     """
     Base class for processed images.
     """
+    _chunk_size = 65536
+    # Streamed chunks are written to disk in batches of this size
+    _write_buffer_size = 1 << 20
+
     _http: AsyncClient
     url: str
     _cached_bytes: bytes | None = field(default=None, init=False, repr=False)
+    _fetch_task: asyncio.Task | None = field(default=None, init=False, repr=False)
 
     async def get_bytes(self) -> bytes:
         """
         Fetches the image bytes from the URL.
+        Concurrent callers share a single download.
 
         :return: The content of the image in bytes.
         :rtype: bytes
         """
         if self._cached_bytes is None:
-            response = await self._http.get(self.url)
-            self._cached_bytes = response.content
+            if self._fetch_task is None:
+                self._fetch_task = asyncio.ensure_future(self._http.get(self.url))
+            fetch_task = self._fetch_task
+            try:
+                response = await asyncio.shield(fetch_task)
+            finally:
+                if self._fetch_task is fetch_task and fetch_task.done():
+                    # Keep only the content so the response can be freed
+                    self._fetch_task = None
+            if self._cached_bytes is None:
+                self._cached_bytes = response.content
         return self._cached_bytes
 
     async def download(self, output: str) -> None:
         """
         Downloads the image and saves it to the specified file path.
 
+        The image is streamed to disk in chunks, written in batches of about
+        1 MiB, unless it has already been fetched into memory.
+
         :param output: The file path where the image will be saved.
         :type output: str
         """
-        Path(output).write_bytes(await self.get_bytes())
-
-
-@dataclass
+        if self._cached_bytes is not None or self._fetch_task is not None:
+            await asyncio.to_thread(Path(output).write_bytes, await self.get_bytes())
+            return
+        async with self._http.stream('GET', self.url) as response:
+            file = await asyncio.to_thread(Path(output).open, 'wb')
+            try:
+                buffer = bytearray()
+                async for chunk in response.aiter_bytes(self._chunk_size):
+                    buffer += chunk
+                    if len(buffer) >= self._write_buffer_size:
+                        await asyncio.to_thread(file.write, buffer)
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(file.write, buffer)
+            finally:
+                await asyncio.to_thread(file.close)
+
+
+@dataclass(slots=True)
 class EnhancedImage(BaseImage):
     """
     Represents an enhanced image.
@@ -53,7 +87,7 @@ class EnhancedImage(BaseImage):
     face_enhanced: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class BackgroundRemovedImage(BaseImage):
     """
     Represents an enhanced image.
@@ -69,7 +103,7 @@ class BackgroundRemovedImage(BaseImage):
     mask: str
 
 
-@dataclass
+@dataclass(slots=True)
 class OCRResult(BaseImage):
     """
     Represents an OCR result.
@@ -89,7 +123,7 @@ class OCRResult(BaseImage):
         return bytes_.decode(encoding=encoding, errors=errors)
 
 
-@dataclass
+@dataclass(slots=True)
 class T2IResult(BaseImage):
     """
     Represents the result of a text-to-image.
@@ -102,7 +136,7 @@ class T2IResult(BaseImage):
     id: str
 
 
-@dataclass
+@dataclass(slots=True)
 class ColorizeResult(BaseImage):
     """
     Represents the result of a colorization operation.
@@ -1,23 +1,91 @@
 from __future__ import annotations
 
 import asyncio
-import base64
+import functools
+import hashlib
 import json
 import mimetypes
+import os
 import random
-import uuid
-from dataclasses import dataclass
-from datetime import datetime
+import secrets
+import time
+from contextlib import aclosing
+from email.utils import formatdate
 from pathlib import Path
-from typing import Any, NamedTuple
+from typing import Any, AsyncIterator, Awaitable, Callable, ClassVar, NamedTuple, TypeVar
 
-import filetype
-from httpx import AsyncClient, Response
+from httpx import AsyncClient, HTTPError, Limits, Response, Timeout
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
 
 from .enums import OCRFormat, OCRLanguage, T2IQuality, T2ISize, T2ITheme
 from .image_models import BackgroundRemovedImage, ColorizeResult, EnhancedImage, OCRResult, T2IResult
 from .signature import Signature
 
+T = TypeVar('T')
+
+if orjson is not None:
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+else:
+    json_loads = json.loads
+
+    def json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+# Signatures of the supported image formats, as (leading bytes,
+# offset of the magic bytes, magic bytes, extension, mimetype)
+IMAGE_SIGNATURES = (
+    (b'', 0, b'\x89PNG\r\n\x1a\n', 'png', 'image/png'),
+    (b'', 0, b'\xff\xd8\xff', 'jpg', 'image/jpeg'),
+    (b'RIFF', 8, b'WEBP', 'webp', 'image/webp'),
+    (b'', 4, b'ftypheic', 'heic', 'image/heic'),
+    (b'', 4, b'ftypheix', 'heic', 'image/heic'),
+    (b'', 0, b'GIF8', 'gif', 'image/gif'),
+    (b'', 0, b'BM', 'bmp', 'image/bmp'),
+    (b'', 0, b'II*\x00', 'tif', 'image/tiff'),
+    (b'', 0, b'MM\x00*', 'tif', 'image/tiff'),
+)
+
+
+@functools.lru_cache(maxsize=64)
+def guess_mimetype(suffix: str) -> str | None:
+    """
+    Guesses the mimetype for a file extension such as `.jpg`.
+    """
+    return mimetypes.guess_type(f'file{suffix}')[0]
+
+
+def guess_filetype(data: bytes) -> tuple[str, str]:
+    """
+    Sniffs the extension and mimetype of an image from its leading bytes.
+    """
+    for prefix, offset, magic, extension, mimetype in IMAGE_SIGNATURES:
+        if data.startswith(magic, offset) and data.startswith(prefix):
+            return extension, mimetype
+    raise ValueError('Unsupported image format.')
+
+
+@functools.lru_cache(maxsize=16)
+def encode_callback(url: str, body: str, body_type: str) -> str:
+    """
+    Encodes the OSS upload callback as base64 JSON. Uploads that share an
+    authorization reuse the encoded value.
+    """
+    return base64.b64encode(json_dumps({
+        'callbackUrl': url,
+        'callbackBody': body,
+        'callbackBodyType': body_type,
+    })).decode()
+
 
 class PicwishError(Exception):
     """
@@ -37,34 +105,241 @@ class PicwishError(Exception):
         self.api_status = api_status
 
 
+def unique_filenames(filenames: list[str]) -> list[str]:
+    """
+    Suffixes repeated filenames so that every name in the list is unique,
+    e.g. `image.png`, `image-1.png`, `image-2.png`.
+    """
+    seen = set()
+    result = []
+    for filename in filenames:
+        name = filename
+        stem, dot, extension = filename.rpartition('.')
+        if not dot:
+            stem, extension = filename, ''
+        n = 0
+        while name in seen:
+            n += 1
+            name = f'{stem}-{n}{dot}{extension}'
+        seen.add(name)
+        result.append(name)
+    return result
+
+
+# Number of callers awaiting each shared future
+_shared_waiters: dict[asyncio.Future, int] = {}
+
+
+async def wait_shared(future: asyncio.Future[T], inflight: dict, key: Any) -> T:
+    """
+    Awaits a future that concurrent callers share through `inflight[key]`.
+    A cancelled caller leaves the future running for the others, but the
+    future itself is cancelled along with its last caller, so abandoned
+    work does not keep running. It is then unregistered right away, so
+    that a new caller starts afresh instead of joining the cancellation.
+    """
+    _shared_waiters[future] = _shared_waiters.get(future, 0) + 1
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if _shared_waiters[future] == 1 and not future.done():
+            future.cancel()
+            if inflight.get(key) is future:
+                del inflight[key]
+        raise
+    finally:
+        _shared_waiters[future] -= 1
+        if not _shared_waiters[future]:
+            del _shared_waiters[future]
+
+
+class FileStream:
+    """
+    Asynchronous byte stream over a file. Chunks are read in a worker thread
+    so large uploads neither block the event loop nor sit fully in memory.
+    The stream can be iterated more than once, which keeps retries possible.
+
+    :param path: The path of the file to stream.
+    :type path: Path
+    """
+    chunk_size = 65536
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        file = await asyncio.to_thread(self.path.open, 'rb')
+        try:
+            while chunk := await asyncio.to_thread(file.read, self.chunk_size):
+                yield chunk
+        finally:
+            file.close()
+
+
+class T2IBatch:
+    """
+    Text-to-image requests with the same settings that are generated together.
+    """
+    __slots__ = ('handle', 'configs', 'max_attempts', 'size', 'requests')
+
+    def __init__(self, configs: dict, max_attempts: int) -> None:
+        self.handle: asyncio.TimerHandle | None = None
+        self.configs = configs
+        self.max_attempts = max_attempts
+        self.size = 0
+        # (batch size, future) of each queued request
+        self.requests: list[tuple[int, asyncio.Future]] = []
+
+
 class CustomAPIRoute(NamedTuple):
     task: str | None = None
     image_url: str | None = None
 
 
-@dataclass(frozen=True)
 class Task:
-    api: API
-    id: str  # Task ID
+    __slots__ = ('api', 'route', 'id')
+
+    # Polling loops shared by concurrent waiters, keyed by (route, task ID)
+    _inflight: ClassVar[dict[tuple[str | None, str], asyncio.Future]] = {}
+    # Task result keys that may hold the unwatermarked image URL
+    _combined_image_keys = ('no_watermark_image', 'hd_image')
+
+    def __init__(self, api: API, route: CustomAPIRoute, id: str) -> None:
+        self.api = api
+        self.route = route
+        self.id = id  # Task ID
 
     async def get_result(self) -> dict:
-        return await self.api.get_task_result(self.id)
+        return await self.api.get_task_result(self.route, self.id)
 
-    async def wait(self, interval: float) -> dict:
+    async def wait(
+        self,
+        interval: float,
+        max_interval: float | None = None,
+        min_interval: float | None = None,
+        backoff_factor: float = 1.5
+    ) -> dict:
         """
         Waits for the task to complete and returns the final result.
+        Polling starts quickly and backs off while the task is not
+        advancing. Concurrent waiters on the same task share a single
+        polling loop, which stops once every waiter is cancelled.
+
+        :param interval: The base delay between progress checks, in seconds.
+        :type interval: float
+        :param max_interval: The upper bound the delay backs off to, in seconds.
+            Defaults to four times `interval`.
+        :type max_interval: float | None
+        :param min_interval: The delay between the first and second progress checks,
+            in seconds. The first check is made right away. Defaults to `interval`, but at most 0.2.
+        :type min_interval: float | None
+        :param backoff_factor: The factor the delay grows by while the task is not advancing.
+        :type backoff_factor: float
+        """
+        key = (self.route.task, self.id)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._poll(interval, max_interval, min_interval, backoff_factor))
+            self._inflight[key] = future
+            future.add_done_callback(functools.partial(self._unregister, key))
+        return await wait_shared(future, self._inflight, key)
+
+    @classmethod
+    def _unregister(cls, key: tuple[str | None, str], future: asyncio.Future) -> None:
+        if cls._inflight.get(key) is future:
+            del cls._inflight[key]
+
+    async def wait_for_image_url(
+        self,
+        interval: float,
+        quality: str = 'free',
+        combined: bool = False,
+        max_interval: float | None = None,
+        min_interval: float | None = None,
+        backoff_factor: float = 1.5
+    ) -> dict:
         """
+        Waits for the task to complete and returns the data from
+        :meth:`get_image_url`. Once the task is nearly done, the image URL
+        is requested alongside each progress check, which saves a round
+        trip when the task finishes.
+
+        :param interval: The base delay between progress checks, in seconds.
+        :type interval: float
+        :param quality: The picture quality of the image URL.
+        :type quality: str
+        :param combined: Whether to take the image URL from the task result
+            when it already includes an unwatermarked variant, instead of
+            requesting it separately.
+        :type combined: bool
+        :param max_interval: The upper bound the delay backs off to, in seconds.
+        :type max_interval: float | None
+        :param min_interval: The delay between the first and second progress checks,
+            in seconds. The first check is made right away.
+        :type min_interval: float | None
+        :param backoff_factor: The factor the delay grows by while the task is not advancing.
+        :type backoff_factor: float
+        """
+        return await self._poll(interval, max_interval, min_interval, backoff_factor, quality, combined)
+
+    async def _poll(
+        self,
+        interval: float,
+        max_interval: float | None = None,
+        min_interval: float | None = None,
+        backoff_factor: float = 1.5,
+        image_url_quality: str | None = None,
+        combined: bool = False
+    ) -> dict:
+        if max_interval is None:
+            max_interval = interval * 4
+        if min_interval is None:
+            min_interval = min(interval, 0.2)
+        delay = min_interval
+        last_progress = 0
         while True:
-            data = await self.get_result()
-            if data['data'].get('image') or data['data'].get('progress') == 100:
-                return data
-            await asyncio.sleep(interval)
+            image_url = None
+            if image_url_quality is not None and not combined and last_progress > 90:
+                data, image_url = await asyncio.gather(
+                    self.get_result(),
+                    self.get_image_url(image_url_quality),
+                    return_exceptions=True
+                )
+                if isinstance(data, BaseException):
+                    raise data
+            else:
+                data = await self.get_result()
+            progress = data['data'].get('progress') or 0
+            if data['data'].get('image') or progress == 100:
+                if image_url_quality is None:
+                    return data
+                if combined:
+                    for key in self._combined_image_keys:
+                        if data['data'].get(key):
+                            return {**data, 'data': data['data'] | {'image': data['data'][key]}}
+                if isinstance(image_url, dict) and image_url['data'].get('image'):
+                    return image_url
+                # The speculative request failed or was not made
+                return await self.get_image_url(image_url_quality)
+            estimated_time = data['data'].get('estimated_time')
+            if estimated_time:
+                # Check back halfway through the time the server expects
+                delay = min(max(estimated_time / 2, min_interval), max_interval)
+            elif progress > 90:
+                # Nearly done, check back soon
+                delay = min(delay, interval / 4)
+            # Jittered so that concurrent tasks do not poll in lockstep
+            await asyncio.sleep(delay + random.uniform(0, delay / 10))
+            if not estimated_time and progress - last_progress <= 10:
+                # Back off while the task is not visibly advancing
+                delay = min(delay * backoff_factor, max_interval)
+            last_progress = progress
 
     async def get_image_url(self, quality: str = 'free') -> dict:
         """
         Retrieves the URL of the processed image for the task.
         """
-        return await self.api.get_image_url(self.id, quality)
+        return await self.api.get_image_url(self.route, self.id, quality)
 
 
 class API:
@@ -73,10 +348,11 @@ class API:
 
     :param http: The asynchronous HTTP client.
     :type http: AsyncClient
-    :param retry_after: Delay before retrying requests if a 429 error occurs.
+    :param retry_after: Base delay before retrying requests if a 429 error occurs.
+        The delay doubles with every attempt, up to `_max_retry_delay`.
     :type retry_after: float | None
-    :param route: Route object containing API routes.
-    :type CustomAPIRoute
+    :param max_retries: The maximum number of retries for a rate limited request.
+    :type max_retries: int
     """
     _base_url = 'https://gw.aoscdn.com/app/picwish'
     _api_version = 'v2'
@@ -86,47 +362,76 @@ class API:
         'product_id': _product_id,
         'language': _language
     }
+    # Image URL query parameters, keyed by picture quality
+    _quality_params = {
+        'free': _params | {'pic_quality': 'free'}
+    }
     _user_agent = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
                    'AppleWebKit/537.36 (KHTML, like Gecko) '
                    'Chrome/126.0.0.0 Safari/537.36')
+    _max_retry_delay = 30.0
+    _binary_content_types = ('image/', 'application/octet-stream')
+    _oss_authorizations_url = f'{_base_url}/authorizations/oss'
 
-    def __init__(self, http: AsyncClient, retry_after: float | None, route: CustomAPIRoute) -> None:
+    def __init__(self, http: AsyncClient, retry_after: float | None, max_retries: int = 5) -> None:
         self.http = http
         self.retry_after = retry_after
-        self.route = route
-        self.token = ','.join([
-            self._api_version,
-            str(random.randint(10000000, 99999999)),
-            str(self._product_id),
-            uuid.uuid4().hex
-        ])
-
-    @property
-    def _headers(self) -> dict:
-        return {
-            'Authorization': f'Bearer {self.token}',
-            'User-Agent': self._user_agent
-        }
+        self.max_retries = max_retries
+        self._headers = {'User-Agent': self._user_agent}
+        self._pending_authorizations: list[tuple[str, asyncio.Future]] = []
+        # Referenced so that running bulk authorizations are not garbage collected
+        self._background_tasks: set[asyncio.Task] = set()
+        # Task URL prefixes, keyed by route path
+        self._url_prefixes: dict[str, str] = {}
+        self.refresh_token()
+
+    def refresh_token(self) -> None:
+        """
+        Generates a new token. The shared headers dict is updated in place,
+        so requests retried with it pick up the new token.
+        """
+        rand = secrets.randbelow(90000000) + 10000000
+        self.token = f'{self._api_version},{rand},{self._product_id},{secrets.token_hex(16)}'
+        self._headers['Authorization'] = f'Bearer {self.token}'
 
     async def request(self, method: str, url: str, *args, **kwargs) -> tuple[Any, Response]:
-        response = await self.http.request(method, url, *args, **kwargs)
-        api_status = None
-        error_message = response.reason_phrase
-        try:
-            response_data: dict = response.json()
-            api_status = response_data.get('status')
-            error_message = response_data.get('message')
-        except json.JSONDecodeError:
-            response_data = response.text
-        except UnicodeDecodeError:
+        retries = 0
+        # Only requests sent with the shared headers pick up a refreshed token
+        token_refreshable = kwargs.get('headers') is self._headers
+        while True:
+            response = await self.http.request(method, url, *args, **kwargs)
+            api_status = None
+            error_message = response.reason_phrase
             response_data = response.content
-
-        status = response.status_code
-        if (api_status is not None and api_status != 200) or 400 <= status < 600:
-            if status == 429 and self.retry_after is not None:
+            content_type = response.headers.get('content-type', '')
+            # Binary payloads are returned as they are, without a decode attempt
+            if not content_type.startswith(self._binary_content_types):
+                try:
+                    response_data = json_loads(response_data)
+                except UnicodeDecodeError:
+                    pass
+                except ValueError:
+                    response_data = response.text
+                else:
+                    if isinstance(response_data, dict):
+                        api_status = response_data.get('status')
+                        error_message = response_data.get('message')
+
+            status = response.status_code
+            if (api_status is None or api_status == 200) and not 400 <= status < 600:
+                return response_data, response
+
+            if status == 429 and self.retry_after is not None and retries < self.max_retries:
                 # Sleep and retry if the status is 429
-                await asyncio.sleep(self.retry_after)
-                return await self.request(method, url, *args, **kwargs)
+                await asyncio.sleep(self._retry_delay(response, retries))
+                retries += 1
+                continue
+            if 401 in (status, api_status) and token_refreshable:
+                # Retry once with a new token if the current one was rejected,
+                # whether the gateway or the API body reports it
+                token_refreshable = False
+                self.refresh_token()
+                continue
 
             messages = [f'status: {status}']
             if api_status is not None:
@@ -134,11 +439,30 @@ class API:
             messages.append(f'message: {error_message}')
             raise PicwishError(', '.join(messages), self.token, status, api_status)
 
-        return response_data, response
+    def _retry_delay(self, response: Response, attempt: int) -> float:
+        """
+        Returns the delay before retrying a rate limited request, preferring
+        the server's Retry-After header. Otherwise the delay backs off
+        exponentially, jittered so that concurrent requests do not retry
+        in lockstep.
+        """
+        try:
+            return float(response.headers['Retry-After'])
+        except (KeyError, ValueError):
+            return self._backoff_delay(attempt)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """
+        Returns the jittered exponential delay for the given retry attempt.
+        """
+        delay = min(self._max_retry_delay, self.retry_after * 2 ** attempt)
+        return delay + random.uniform(0, self.retry_after)
 
     async def oss_authorizations(self, filename: str) -> dict:
         """
         Retrieves OSS authorization data for the specified filename.
+        Authorizations requested concurrently are fetched in a single
+        bulk request.
 
         :param filename: The name of the file to retrieve authorizations for.
         :type filename: str
@@ -146,22 +470,77 @@ class API:
         :return: A dictionary containing OSS authorization data.
         :rtype: dict
         """
-        url = self._base_url + '/authorizations/oss'
-        data = {'filenames': [filename]}
-        response, _ = await self.request('POST', url, json=data, params=self._params, headers=self._headers)
-        return response
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending_authorizations:
+            # Flush once the callers scheduled in this loop iteration have queued
+            loop.call_soon(self._flush_authorizations)
+        self._pending_authorizations.append((filename, future))
+        return await future
+
+    def _flush_authorizations(self) -> None:
+        pending, self._pending_authorizations = self._pending_authorizations, []
+        task = asyncio.ensure_future(self._authorize_pending(pending))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _authorize_pending(self, pending: list[tuple[str, asyncio.Future]]) -> None:
+        try:
+            authorizations = await self.oss_authorizations_bulk([filename for filename, _ in pending])
+        except BaseException as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            for (_, future), authorization in zip(pending, authorizations):
+                if not future.done():
+                    future.set_result(authorization)
+
+    async def oss_authorizations_bulk(self, filenames: list[str]) -> list[dict]:
+        """
+        Retrieves OSS authorization data for several files in one request.
+        Duplicate filenames are made unique before they are sent.
 
-    async def create_task(self, resource_id: str | None = None, additional_params: dict | None = None) -> dict:
+        :param filenames: The names of the files to retrieve authorizations for.
+        :type filenames: list[str]
+
+        :return: Authorization data for each filename, in the same order and
+            shape as returned by :meth:`oss_authorizations`.
+        :rtype: list[dict]
+        """
+        filenames = unique_filenames(filenames)
+        url = self._oss_authorizations_url
+        data = {'filenames': filenames}
+        response, _ = await self.request('POST', url, json=data, params=self._params, headers=self._headers)
+        objects = response['data']['objects']
+        authorizations = []
+        for filename in filenames:
+            object = objects.get(filename)
+            if object is None:
+                raise PicwishError(f'No OSS authorization returned for {filename!r}.', self.token)
+            authorizations.append(response | {'data': response['data'] | {'objects': {filename: object}}})
+        return authorizations
+
+    async def create_task(
+        self,
+        route: CustomAPIRoute,
+        resource_id: str | None = None,
+        additional_params: dict | None = None
+    ) -> dict:
         """
         Creates a task for the given resource ID.
 
+        :param route: Route object containing API routes.
+        :type route: CustomAPIRoute
         :param additional_params: Optional additional parameters to include in the task creation request.
         :type additional_params: dict | None
 
         :return: API response.
         :rtype: dict
         """
-        url = self._base_url + self.route.task
+        url = f'{self._base_url}{route.task}'
         data = {
             'website': 'en'
         }
@@ -172,32 +551,47 @@ class API:
         response, _ = await self.request('POST', url, params=self._params, json=data, headers=self._headers)
         return response
 
-    async def get_image_url(self, task_id: str, quality: str) -> dict:
+    def _url_prefix(self, path: str) -> str:
+        """
+        Returns the URL that task IDs are appended to for the route path.
+        """
+        prefix = self._url_prefixes.get(path)
+        if prefix is None:
+            prefix = self._url_prefixes[path] = f'{self._base_url}{path}/'
+        return prefix
+
+    async def get_image_url(self, route: CustomAPIRoute, task_id: str, quality: str) -> dict:
         """
         Retrieves the image URL for the given task ID.
 
+        :param route: Route object containing API routes.
+        :type route: CustomAPIRoute
         :param task_id: The ID of the task.
         :type task_id: str
 
         :return: A dict containing the image URL and additional data.
         :rtype: dict
         """
-        url = self._base_url + self.route.image_url + f'/{task_id}'
-        params = self._params | {'pic_quality': quality}
+        url = self._url_prefix(route.image_url) + task_id
+        params = self._quality_params.get(quality)
+        if params is None:
+            params = self._quality_params[quality] = self._params | {'pic_quality': quality}
         response, _ = await self.request('GET', url, params=params, headers=self._headers)
         return response
 
-    async def get_task_result(self, task_id: str) -> dict:
+    async def get_task_result(self, route: CustomAPIRoute, task_id: str) -> dict:
         """
         Retrieves the task information for the given task ID.
 
+        :param route: Route object containing API routes.
+        :type route: CustomAPIRoute
         :param task_id: The ID of the task.
         :type task_id: str
 
         :return: A dictionary containing the task information.
         :rtype: dict
         """
-        url = self._base_url + self.route.task + f'/{task_id}'
+        url = self._url_prefix(route.task) + task_id
         response, _ = await self.request('GET', url, params=self._params, headers=self._headers)
         return response
 
@@ -208,17 +602,130 @@ class PicWish:
 
     :param sleep_duration: The duration to sleep between progress checks, in seconds.
     :type sleep_duration: float
+    :param min_sleep_duration: The duration to sleep between the first and second
+        progress checks, in seconds. The first check is made right away. Defaults to `sleep_duration`, but at most 0.2.
+    :type min_sleep_duration: float | None
+    :param max_sleep_duration: The longest duration to sleep between progress checks
+        while a task is not advancing, in seconds. Defaults to four times `sleep_duration`.
+    :type max_sleep_duration: float | None
+    :param backoff_factor: The factor the sleep duration grows by while a task is not advancing.
+    :type backoff_factor: float
     :param retry_after: Delay before retrying requests if 429 error occurs.
     :type retry_after: float | None
-    :param kwargs: Optional HTTP client settings.
+    :param max_retries: The maximum number of retries for a rate limited request.
+    :type max_retries: int
+    :param assume_combined_response: Whether to take unwatermarked image URLs
+        from the task result when it includes them, saving a request per image.
+        Falls back to requesting the image URL when the result lacks them.
+    :type assume_combined_response: bool
+    :param max_concurrent_uploads: The maximum number of images uploaded at once.
+    :type max_concurrent_uploads: int
+    :param result_cache_ttl: How long, in seconds, results of :meth:`enhance`
+        and :meth:`ocr` are reused for identical images and options. Identical calls that
+        run concurrently always share one task. If set, results of
+        :meth:`text_to_image` are also reused for identical prompts and settings.
+    :type result_cache_ttl: float
+    :param text_to_image_batch_window: How long, in seconds, :meth:`text_to_image`
+        requests with the same settings are collected to be generated in a single
+        task of up to 4 images. Disabled by default.
+    :type text_to_image_batch_window: float
+    :param http: An existing HTTP client to use, so that several instances
+        share one connection pool. It is not closed by :meth:`aclose`.
+    :type http: AsyncClient | None
+    :param kwargs: Optional HTTP client settings. By default the client speaks
+        HTTP/2 and keeps connections alive so that uploads, polls and
+        downloads reuse the same connection.
     """
-    def __init__(self, sleep_duration: float = 0.5, retry_after: float | None = 0.5, **kwargs) -> None:
-        self.http = AsyncClient(**kwargs)
+    _enhance_route = CustomAPIRoute(
+        task='/tasks/login/scale',
+        image_url='/tasks/login/image-url/scale'
+    )
+    _remove_background_route = CustomAPIRoute(
+        task='/tasks/login/segmentation',
+        image_url='/tasks/login/image-url/segmentation'
+    )
+    _ocr_route = CustomAPIRoute(task='/tasks/ocr')
+    _text_to_image_route = CustomAPIRoute(task='/tasks/login/external/text-to-image')
+    _colorize_route = CustomAPIRoute(task='/tasks/colorization')
+
+    # Task parameters, keyed by whether faces are enhanced
+    _enhance_params = {
+        True: {'type': 2},
+        False: {'type': 1}
+    }
+    _remove_background_params = {'output_type': 1}
+    # The most images a single text-to-image task generates
+    _max_text_to_image_batch_size = 4
+
+    def __init__(
+        self,
+        sleep_duration: float = 0.5,
+        retry_after: float | None = 0.5,
+        max_retries: int = 5,
+        assume_combined_response: bool = False,
+        min_sleep_duration: float | None = None,
+        max_sleep_duration: float | None = None,
+        backoff_factor: float = 1.5,
+        max_concurrent_uploads: int = 8,
+        result_cache_ttl: float = 0.0,
+        text_to_image_batch_window: float = 0.0,
+        http: AsyncClient | None = None,
+        **kwargs
+    ) -> None:
+        self._owns_http = http is None
+        if http is None:
+            kwargs.setdefault('http2', True)
+            kwargs.setdefault('limits', Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=30.0))
+            kwargs.setdefault('timeout', Timeout(30.0, connect=10.0))
+            http = AsyncClient(**kwargs)
+        self.http = http
         self.sleep_duration = sleep_duration
+        self.min_sleep_duration = min_sleep_duration
+        self.max_sleep_duration = max_sleep_duration
+        self.backoff_factor = backoff_factor
         self.retry_after = retry_after
-
-    def _init_api(self, route: CustomAPIRoute) -> API:
-        return API(self.http, self.retry_after, route)
+        self.assume_combined_response = assume_combined_response
+        self.result_cache_ttl = result_cache_ttl
+        self._upload_semaphore = asyncio.Semaphore(max_concurrent_uploads)
+        self.text_to_image_batch_window = text_to_image_batch_window
+        self._text_to_image_batches: dict[tuple, T2IBatch] = {}
+        # Referenced so that running batches are not garbage collected
+        self._background_tasks: set[asyncio.Task] = set()
+        # Moving averages of text-to-image generation times, keyed by speed
+        self._text_to_image_durations: dict[int, float] = {}
+        # Results keyed by (method, source key, options)
+        self._inflight_results: dict[tuple, asyncio.Future] = {}
+        self._cached_results: dict[tuple, tuple[float, Any]] = {}
+        # A single API, and thus a single token, is shared by all calls
+        self.api = API(self.http, retry_after, max_retries)
+
+    async def __aenter__(self) -> PicWish:
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Cancels the running background work and closes the underlying HTTP
+        client and its pooled connections, unless the client was passed in.
+        """
+        tasks = [*self._background_tasks, *self.api._background_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._owns_http:
+            await self.http.aclose()
+
+    async def warmup(self) -> None:
+        """
+        Opens a connection to the API host ahead of the first call, so that
+        it does not pay for the TCP and TLS handshakes. Failures are ignored.
+        """
+        try:
+            await self.http.head(self.api._base_url, headers=self.api._headers)
+        except HTTPError:
+            pass
 
     @staticmethod
     def _signature(mimetype: str, oss: str) -> tuple[str, dict]:
@@ -240,14 +747,13 @@ class PicWish:
         accelerate = oss['data']['accelerate']
         bucket = oss['data']['bucket']
         object = next(iter(oss['data']['objects'].values()))
-        GMT_FORMAT = '%a, %d %b %Y %H:%M:%S GMT'
-
-        time = datetime.utcnow().strftime(GMT_FORMAT)
-        callback = base64.b64encode(json.dumps({
-            'callbackUrl': oss['data']['callback']['url'],
-            'callbackBody': oss['data']['callback']['body'],
-            'callbackBodyType': oss['data']['callback']['type'],
-        }).encode()).decode()
+
+        time = formatdate(usegmt=True)
+        callback = encode_callback(
+            oss['data']['callback']['url'],
+            oss['data']['callback']['body'],
+            oss['data']['callback']['type']
+        )
         headers = {
             'X-Oss-Date': time,
             'X-Oss-Security-Token': security_token,
@@ -271,46 +777,211 @@ class PicWish:
         return url, headers
 
     @staticmethod
-    def _process_source(source: str | bytes) -> tuple[str, str, bytes]:
+    async def _process_source(source: str | bytes, size: int | None = None) -> tuple[str, str, int, bytes | FileStream]:
         """
-        Processes the image source and returns the filename and bytes.
+        Processes the image source and returns its upload metadata and content.
+        File paths are streamed from disk rather than read into memory.
 
         :param source: The image source. path or bytes.
         :type source: str | bytes
+        :param size: The size of the source in bytes, if already known.
+        :type size: int | None
 
-        :return: Tuple of filename, mimetype, the bytes of the image.
-        :rtype: tuple[str, str, bytes]
+        :return: Tuple of filename, mimetype, size in bytes and the upload content.
+        :rtype: tuple[str, str, int, bytes | FileStream]
         """
         if isinstance(source, str):
             path: Path = Path(source)
             filename = path.name
-            bytes_ = path.read_bytes()
-            mimetype = mimetypes.guess_type(filename)[0]
+            if size is None:
+                size = (await asyncio.to_thread(path.stat)).st_size
+            content = FileStream(path)
+            mimetype = guess_mimetype(path.suffix)
         elif isinstance(source, bytes):
-            ft = filetype.guess(source)
-            filename = f'image.{ft.extension}'
-            bytes_ = source
-            mimetype = ft.mime
+            extension, mimetype = guess_filetype(source)
+            filename = f'image.{extension}'
+            size = len(source)
+            content = source
         else:
             raise TypeError('Source must be string or bytes.')
-        return filename, mimetype, bytes_
+        return filename, mimetype, size, content
 
-    async def _get_resource_id(self, api: API, source: str | bytes) -> str:
-        filename, mimetype, bytes_ = self._process_source(source)
-        oss = await api.oss_authorizations(filename)
+    async def _get_resource_id(self, source: str | bytes, size: int | None = None) -> str:
+        if isinstance(source, str):
+            # The filename is known up front, so authorize while the file is inspected
+            (_, mimetype, size, content), oss = await asyncio.gather(
+                self._process_source(source, size),
+                self.api.oss_authorizations(Path(source).name)
+            )
+        else:
+            filename, mimetype, size, content = await self._process_source(source)
+            oss = await self.api.oss_authorizations(filename)
         url, headers = self._signature(mimetype, oss)
+        headers['Content-Length'] = str(size)
         # Upload the image with signature
-        response, _ = await api.request('PUT', url, data=bytes_, headers=headers)
+        async with self._upload_semaphore:
+            response, _ = await self.api.request('PUT', url, content=content, headers=headers)
         return response['data']['resource_id']
 
-    async def _create_task(self, api: API, source: str | bytes | None = None, additional_params: dict | None = None) -> Task:
+    async def _create_task(
+        self,
+        route: CustomAPIRoute,
+        source: str | bytes | None = None,
+        additional_params: dict | None = None,
+        size: int | None = None
+    ) -> Task:
         if source is None:
-            task_data = await api.create_task(additional_params=additional_params)
+            task_data = await self.api.create_task(route, additional_params=additional_params)
         else:
-            resource_id = await self._get_resource_id(api, source)
-            task_data = await api.create_task(resource_id, additional_params)
+            resource_id = await self._get_resource_id(source, size)
+            task_data = await self.api.create_task(route, resource_id, additional_params)
         task_id = task_data['data']['task_id']
-        return Task(api, task_id)
+        return Task(self.api, route, task_id)
+
+    async def _wait(self, task: Task, no_watermark: bool = False) -> dict:
+        """
+        Waits for the task with the configured sleep durations. If
+        `no_watermark` is True, the data of the unwatermarked image URL
+        is returned instead of the task result.
+        """
+        if no_watermark:
+            return await task.wait_for_image_url(
+                self.sleep_duration,
+                combined=self.assume_combined_response,
+                max_interval=self.max_sleep_duration,
+                min_interval=self.min_sleep_duration,
+                backoff_factor=self.backoff_factor
+            )
+        return await task.wait(
+            self.sleep_duration,
+            self.max_sleep_duration,
+            self.min_sleep_duration,
+            self.backoff_factor
+        )
+
+    @staticmethod
+    async def _source_key(source: str | bytes) -> tuple[tuple, int]:
+        """
+        Returns a key identifying the content of the source, along with its
+        size for the upload. Byte sources are hashed and path sources are
+        identified by their modification time and size. The stat call is
+        cheap and made inline, so that concurrent uploads still request
+        their authorizations together.
+        """
+        if isinstance(source, bytes):
+            if len(source) > 1 << 20:
+                digest = (await asyncio.to_thread(hashlib.blake2b, source, digest_size=16)).digest()
+            else:
+                digest = hashlib.blake2b(source, digest_size=16).digest()
+            return ('bytes', digest), len(source)
+        if isinstance(source, str):
+            stat = os.stat(source)
+            return ('path', source, stat.st_mtime_ns, stat.st_size), stat.st_size
+        raise TypeError('Source must be string or bytes.')
+
+    async def _deduplicate(self, key: tuple, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs `func` once for concurrent calls with the same key, and reuses
+        its result for `result_cache_ttl` seconds afterwards. The call is
+        cancelled once every caller waiting on it is cancelled.
+        """
+        cached = self._cached_results.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                return cached[1]
+            del self._cached_results[key]
+        future = self._inflight_results.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._inflight_results[key] = future
+            future.add_done_callback(functools.partial(self._store_result, key))
+        return await wait_shared(future, self._inflight_results, key)
+
+    def _store_result(self, key: tuple, future: asyncio.Future) -> None:
+        if self._inflight_results.get(key) is future:
+            del self._inflight_results[key]
+        if self.result_cache_ttl > 0 and not future.cancelled() and future.exception() is None:
+            now = time.monotonic()
+            # Drop expired entries so the cache does not grow unbounded
+            for k in [k for k, (expires, _) in self._cached_results.items() if expires <= now]:
+                del self._cached_results[k]
+            self._cached_results[key] = (now + self.result_cache_ttl, future.result())
+
+    async def _bounded_map(
+        self,
+        func: Callable[..., Awaitable[T]],
+        sources: list[str | bytes],
+        concurrency: int,
+        kwargs: dict
+    ) -> AsyncIterator[T]:
+        """
+        Runs `func` for every source with a pool of at most `concurrency`
+        workers pulling from a queue, and yields the results in input order.
+        A worker that is still rate limited after the API's own retries
+        puts its source back and retires, lowering the concurrency, as long
+        as another worker is live to pick it up. The last live worker backs
+        off and retries in place instead. The workers are cancelled once
+        iteration stops.
+        """
+        if concurrency <= 0:
+            raise ValueError('concurrency must be positive')
+        queue: asyncio.Queue[tuple[int, str | bytes]] = asyncio.Queue()
+        for item in enumerate(sources):
+            queue.put_nowait(item)
+        loop = asyncio.get_running_loop()
+        results = [loop.create_future() for _ in sources]
+        active_workers = min(concurrency, len(sources))
+
+        async def worker() -> None:
+            nonlocal active_workers
+            try:
+                while not queue.empty():
+                    index, source = queue.get_nowait()
+                    attempt = 0
+                    while True:
+                        try:
+                            results[index].set_result(await func(source, **kwargs))
+                        except PicwishError as e:
+                            if e.status_code == 429:
+                                if active_workers > 1:
+                                    queue.put_nowait((index, source))
+                                    return
+                                if self.retry_after is not None and attempt < self.api.max_retries:
+                                    await asyncio.sleep(self.api._backoff_delay(attempt))
+                                    attempt += 1
+                                    continue
+                            results[index].set_exception(e)
+                        except Exception as e:
+                            results[index].set_exception(e)
+                        break
+            finally:
+                active_workers -= 1
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(active_workers)]
+        try:
+            for result in results:
+                yield await result
+        finally:
+            for worker_task in workers:
+                worker_task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            # Retrieve exceptions nobody awaited so they are not logged
+            for result in results:
+                if result.done() and not result.cancelled():
+                    result.exception()
+
+    async def _map(
+        self,
+        func: Callable[..., Awaitable[T]],
+        sources: list[str | bytes],
+        concurrency: int,
+        kwargs: dict
+    ) -> list[T]:
+        """
+        Like :meth:`_bounded_map`, but collects the results into a list.
+        """
+        async with aclosing(self._bounded_map(func, sources, concurrency, kwargs)) as results:
+            return [result async for result in results]
 
     async def enhance(
         self,
@@ -332,20 +1003,63 @@ class PicWish:
         :return: An EnhancedImage object.
         :rtype: EnhancedImage
         """
-        route = CustomAPIRoute(
-            task='/tasks/login/scale',
-            image_url='/tasks/login/image-url/scale'
-        )
-        api = self._init_api(route=route)
-        task = await self._create_task(api, source, {'type': 2 if enhance_face else 1})
-        data = await task.wait(self.sleep_duration)
+        source_key, size = await self._source_key(source)
+        key = ('enhance', source_key, no_watermark, enhance_face)
+        return await self._deduplicate(key, lambda: self._enhance(source, no_watermark, enhance_face, size))
 
-        watermark = True
-        if no_watermark:
-            watermark = False
-            data = await task.get_image_url()
+    async def _enhance(
+        self,
+        source: str | bytes,
+        no_watermark: bool,
+        enhance_face: bool,
+        size: int | None = None
+    ) -> EnhancedImage:
+        task = await self._create_task(self._enhance_route, source, self._enhance_params[enhance_face], size)
+        data = await self._wait(task, no_watermark)
+        watermark = not no_watermark
         return EnhancedImage(self.http, data['data']['image'], watermark, enhance_face)
 
+    async def enhance_many(self, sources: list[str | bytes], *, concurrency: int = 8, **kwargs) -> list[EnhancedImage]:
+        """
+        Enhances multiple images concurrently.
+
+        :param sources: The image sources, each a file path or a byte stream.
+        :type sources: list[str | bytes]
+        :param concurrency: The maximum number of images processed at once.
+        :type concurrency: int
+        :param kwargs: Keyword arguments passed to :meth:`enhance`.
+
+        :return: A list of EnhancedImage objects in the same order as `sources`.
+        :rtype: list[EnhancedImage]
+        """
+        return await self._map(self.enhance, sources, concurrency, kwargs)
+
+    async def map_enhance(
+        self,
+        sources: list[str | bytes],
+        *,
+        concurrency: int = 8,
+        **kwargs
+    ) -> AsyncIterator[EnhancedImage]:
+        """
+        Enhances multiple images with a bounded pool of workers, yielding
+        each result in input order as soon as it and all earlier ones are ready.
+
+        :param sources: The image sources, each a file path or a byte stream.
+        :type sources: list[str | bytes]
+        :param concurrency: The maximum number of images processed at once.
+        :type concurrency: int
+        :param kwargs: Keyword arguments passed to :meth:`enhance`.
+
+        :return: An async iterator of EnhancedImage objects. Close it, e.g. with
+            `contextlib.aclosing`, to cancel the remaining work when
+            breaking out early.
+        :rtype: AsyncIterator[EnhancedImage]
+        """
+        async with aclosing(self._bounded_map(self.enhance, sources, concurrency, kwargs)) as results:
+            async for result in results:
+                yield result
+
     async def remove_background(self, source: str | bytes, *, no_watermark: bool = True) -> BackgroundRemovedImage:
         """
         Removes the background from an image and returns an BackgroundRemovedImage object.
@@ -358,20 +1072,59 @@ class PicWish:
         :return: An BackgroundRemovedImage object.
         :rtype: BackgroundRemovedImage
         """
-        route = CustomAPIRoute(
-            task='/tasks/login/segmentation',
-            image_url='/tasks/login/image-url/segmentation'
-        )
-        api = self._init_api(route=route)
-        task = await self._create_task(api, source, {'output_type': 1})
-        data = await task.wait(self.sleep_duration)
-
-        watermark = True
-        if no_watermark:
-            watermark = False
-            data = await task.get_image_url()
+        task = await self._create_task(self._remove_background_route, source, self._remove_background_params)
+        data = await self._wait(task, no_watermark)
+        watermark = not no_watermark
         return BackgroundRemovedImage(self.http, data['data']['image'], watermark, data['data']['mask'])
 
+    async def remove_background_many(
+        self,
+        sources: list[str | bytes],
+        *,
+        concurrency: int = 8,
+        **kwargs
+    ) -> list[BackgroundRemovedImage]:
+        """
+        Removes the background from multiple images concurrently.
+
+        :param sources: The image sources, each a file path or a byte stream.
+        :type sources: list[str | bytes]
+        :param concurrency: The maximum number of images processed at once.
+        :type concurrency: int
+        :param kwargs: Keyword arguments passed to :meth:`remove_background`.
+
+        :return: A list of BackgroundRemovedImage objects in the same order as `sources`.
+        :rtype: list[BackgroundRemovedImage]
+        """
+        return await self._map(self.remove_background, sources, concurrency, kwargs)
+
+    async def map_remove_background(
+        self,
+        sources: list[str | bytes],
+        *,
+        concurrency: int = 8,
+        **kwargs
+    ) -> AsyncIterator[BackgroundRemovedImage]:
+        """
+        Removes the background from multiple images with a bounded pool of
+        workers, yielding each result in input order as soon as it and all
+        earlier ones are ready.
+
+        :param sources: The image sources, each a file path or a byte stream.
+        :type sources: list[str | bytes]
+        :param concurrency: The maximum number of images processed at once.
+        :type concurrency: int
+        :param kwargs: Keyword arguments passed to :meth:`remove_background`.
+
+        :return: An async iterator of BackgroundRemovedImage objects. Close it, e.g. with
+            `contextlib.aclosing`, to cancel the remaining work when
+            breaking out early.
+        :rtype: AsyncIterator[BackgroundRemovedImage]
+        """
+        async with aclosing(self._bounded_map(self.remove_background, sources, concurrency, kwargs)) as results:
+            async for result in results:
+                yield result
+
     async def ocr(
         self,
         source: str | bytes,
@@ -395,12 +1148,21 @@ class PicWish:
         """
         if languages is None:
             languages = [OCRLanguage.DEFAULT]
-        route = CustomAPIRoute(
-            task='/tasks/ocr',
-        )
-        api = self._init_api(route=route)
-        task = await self._create_task(api, source, {'format': format, 'task_language': ','.join(languages)})
-        data = await task.wait(self.sleep_duration)
+        task_language = ','.join(languages)
+        source_key, size = await self._source_key(source)
+        key = ('ocr', source_key, task_language, format)
+        return await self._deduplicate(key, lambda: self._ocr(source, task_language, format, size))
+
+    async def _ocr(
+        self,
+        source: str | bytes,
+        task_language: str,
+        format: OCRFormat,
+        size: int | None = None
+    ) -> OCRResult:
+        params = {'format': format, 'task_language': task_language}
+        task = await self._create_task(self._ocr_route, source, params, size)
+        data = await self._wait(task)
         return OCRResult(self.http, data['data']['image'], format)
 
     async def text_to_image(
@@ -437,24 +1199,103 @@ class PicWish:
         :return: A list of `T2IResult` objects representing the generated images.
         :rtype: list[T2IResult]
         """
-        route = CustomAPIRoute(
-            task='/tasks/login/external/text-to-image'
-        )
-        api = self._init_api(route=route)
+        # T2ISize members are tuples, so they unpack without Enum lookups
+        width, height = size
         configs = {
             'theme': theme.value,
-            'width': size[0],
-            'height': size[1],
+            'width': width,
+            'height': height,
             'prompt': prompt,
             'batch_size': batch_size,
             'speed': quality.value,
         }
         if negative_prompt is not None:
             configs['negative_prompt'] = negative_prompt
+        if self.result_cache_ttl > 0:
+            # Generation is random, so identical requests are only shared when caching is enabled
+            key = ('text_to_image', *configs.items())
+            return list(await self._deduplicate(key, lambda: self._text_to_image(configs, max_attempts)))
+        return await self._text_to_image(configs, max_attempts)
+
+    async def _text_to_image(self, configs: dict, max_attempts: int) -> list[T2IResult]:
+        if self.text_to_image_batch_window > 0:
+            return await self._batched_text_to_image(configs, max_attempts)
+        return await self._generate_images(configs, max_attempts)
+
+    async def _batched_text_to_image(self, configs: dict, max_attempts: int) -> list[T2IResult]:
+        """
+        Queues the request into a batch with the same settings. The batch is
+        generated in one task once the batch window has passed or it holds
+        the maximum number of images, and its images are split among the
+        queued requests.
+        """
+        loop = asyncio.get_running_loop()
+        key = tuple((k, v) for k, v in configs.items() if k != 'batch_size')
+        batch_size = configs['batch_size']
+        batch = self._text_to_image_batches.get(key)
+        if batch is not None and batch.size + batch_size > self._max_text_to_image_batch_size:
+            # The request does not fit, so the pending batch is generated right away
+            self._flush_text_to_image_batch(key, batch)
+            batch = None
+        if batch is None:
+            batch = self._text_to_image_batches[key] = T2IBatch(configs, max_attempts)
+            batch.handle = loop.call_later(
+                self.text_to_image_batch_window, self._flush_text_to_image_batch, key, batch
+            )
+        future = loop.create_future()
+        batch.size += batch_size
+        batch.requests.append((batch_size, future))
+        if batch.size >= self._max_text_to_image_batch_size:
+            self._flush_text_to_image_batch(key, batch)
+        return await future
+
+    def _flush_text_to_image_batch(self, key: tuple, batch: T2IBatch) -> None:
+        # A timer may outlive its batch, which was then already flushed
+        if self._text_to_image_batches.get(key) is not batch:
+            return
+        del self._text_to_image_batches[key]
+        batch.handle.cancel()
+        task = asyncio.ensure_future(self._run_text_to_image_batch(batch))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _run_text_to_image_batch(self, batch: T2IBatch) -> None:
+        try:
+            results = await self._generate_images(batch.configs | {'batch_size': batch.size}, batch.max_attempts)
+            if len(results) < batch.size:
+                raise PicwishError(f'Expected {batch.size} images, got {len(results)}.', self.api.token)
+        except BaseException as e:
+            for _, future in batch.requests:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        offset = 0
+        for batch_size, future in batch.requests:
+            if not future.done():
+                future.set_result(results[offset:offset + batch_size])
+            offset += batch_size
+
+    async def _generate_images(self, configs: dict, max_attempts: int) -> list[T2IResult]:
+        speed = configs['speed']
+        duration = self._text_to_image_durations.get(speed)
+        initial_delay = 0.0
+        if duration is not None:
+            # Skip the early progress checks of a generation that is known to take
+            # a while, without waiting longer than the usual polling cap
+            max_interval = self.max_sleep_duration
+            if max_interval is None:
+                max_interval = self.sleep_duration * 4
+            initial_delay = min(duration / 2, max_interval)
         for i in range(max_attempts):
-            task = await self._create_task(api, additional_params=configs)
+            task = await self._create_task(self._text_to_image_route, additional_params=configs)
+            started = time.monotonic()
             try:
-                data = await task.wait(self.sleep_duration)
+                if initial_delay:
+                    await asyncio.sleep(initial_delay)
+                data = await self._wait(task)
+                break
             except PicwishError as e:
                 if e.api_status in (-1, -10) and i + 1 < max_attempts:
                     # Retry if the API returns a block status
@@ -462,6 +1303,11 @@ class PicWish:
                     continue
                 raise e from e
 
+        # Track a moving average of the generation time for each quality
+        elapsed = time.monotonic() - started
+        self._text_to_image_durations[speed] = (
+            elapsed if duration is None else duration * 0.7 + elapsed * 0.3
+        )
         return [T2IResult(self.http, i['url'], i['id']) for i in data['data']['images']]
 
     async def colorize(self, source: str | bytes) -> ColorizeResult:
@@ -474,10 +1320,6 @@ class PicWish:
         :return: An ColorizeResult object.
         :rtype: ColorizeResult
         """
-        route = CustomAPIRoute(
-            task='/tasks/colorization',
-        )
-        api = self._init_api(route=route)
-        task = await self._create_task(api, source)
-        data = await task.wait(self.sleep_duration)
+        task = await self._create_task(self._colorize_route, source)
+        data = await self._wait(task)
         return ColorizeResult(self.http, data['data']['image'])
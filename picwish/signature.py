@@ -4,12 +4,23 @@ https://www.alibabacloud.com/help/oss/include-signatures-in-the-authorization-he
 """
 
 import base64
+import functools
 import hashlib
 import hmac
 from dataclasses import dataclass
 from typing import Any
 
 
+@functools.lru_cache(maxsize=16)
+def keyed_hmac(access_key_secret: str) -> hmac.HMAC:
+    """
+    Returns an HMAC-SHA1 object keyed with the access key secret.
+    Copies of it skip the key setup when signing several uploads
+    with the same credential.
+    """
+    return hmac.new(access_key_secret.encode('utf-8'), digestmod=hashlib.sha1)
+
+
 @dataclass(frozen=True)
 class Signature:
     """
@@ -50,15 +61,13 @@ class Signature:
         :return: The canonicalized OSS headers as a string.
         :rtype: str
         """
-        headers = {k.lower(): v for k, v in self.headers.items()}
-        keys = [i.lower() for i in headers.keys()]
-        keys.sort()
-
-        l = []
-        for k in keys:
-            if k.startswith('x-oss-'):
-                l.append(f'{k}:{headers[k]}')
-        return '\n'.join(l)
+        # Filter before sorting so that only the OSS headers are sorted
+        headers = [
+            (lower, v) for k, v in self.headers.items()
+            if (lower := k.lower()).startswith('x-oss-')
+        ]
+        headers.sort()
+        return '\n'.join([f'{k}:{v}' for k, v in headers])
 
     def CanonicalizedResource(self):
         """
@@ -69,12 +78,12 @@ class Signature:
         :return: The canonicalized resource path and query parameters as a string.
         :rtype: str
         """
-        resource_path = f'/{self.bucket}' if self.bucket else ''
-        resource_path += f'/{self.object}' if self.object else ''
-        if self.sub_resources:
-            query_params = '&'.join([f'{k}={v}' for k, v in self.sub_resources.items()])
-            resource_path += f'?{query_params}'
-        return resource_path
+        bucket = f'/{self.bucket}' if self.bucket else ''
+        object = f'/{self.object}' if self.object else ''
+        if not self.sub_resources:
+            return f'{bucket}{object}'
+        query_params = '&'.join([f'{k}={v}' for k, v in self.sub_resources.items()])
+        return f'{bucket}{object}?{query_params}'
 
     def make_signature(self):
         """
@@ -92,15 +101,15 @@ class Signature:
         :return: The base64-encoded signature.
         :rtype: str
         """
-        l = [
-            self.verb,
-            self.content_md5,
-            self.headers['Content-Type'],
-            self.headers['X-Oss-Date'],
-            self.CanonicalizedOSSHeaders(),
-            self.CanonicalizedResource()
-        ]
-        string_to_sign = '\n'.join(l)
-        signature = hmac.new(self.access_key_secret.encode('utf-8'), string_to_sign.encode('utf-8'), hashlib.sha1)
+        string_to_sign = (
+            f'{self.verb}\n'
+            f'{self.content_md5}\n'
+            f'{self.headers["Content-Type"]}\n'
+            f'{self.headers["X-Oss-Date"]}\n'
+            f'{self.CanonicalizedOSSHeaders()}\n'
+            f'{self.CanonicalizedResource()}'
+        )
+        signature = keyed_hmac(self.access_key_secret).copy()
+        signature.update(string_to_sign.encode('utf-8'))
         signature_base64 = base64.b64encode(signature.digest()).decode()
         return signature_base64
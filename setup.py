@@ -12,9 +12,11 @@ setup(
     name='picwish',
     version=version,
     install_requires=[
-        'httpx',
-        'filetype'
+        'httpx[http2]'
     ],
+    extras_require={
+        'speedups': ['orjson', 'pybase64', 'httpx[brotli]']
+    },
     python_requires='>=3.10',
     description='Picwish Photo Enhancer',
     long_description=long_description,
@@ -1,4 +1,5 @@
 import asyncio
+import sys
 
 import picwish
 from picwish import PicWish
@@ -6,12 +7,27 @@ from picwish.enums import OCRFormat
 
 print(picwish.__version__)
 
-picwish = PicWish()
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# libuv-based event loop, where available
+loop_factory = uvloop.new_event_loop if uvloop is not None else None
+
 
 async def main():
-    result = await picwish.ocr('c.jpg', format=OCRFormat.TXT)
-    print(await result.text())
-    result = await picwish.ocr('c.jpg', format=OCRFormat.PDF)
-    print(await result.download('1.pdf'))
+    async with PicWish() as client:
+        txt, pdf = await asyncio.gather(
+            client.ocr('c.jpg', format=OCRFormat.TXT),
+            client.ocr('c.jpg', format=OCRFormat.PDF)
+        )
+        print(await txt.text())
+        print(await pdf.download('1.pdf'))
 
-asyncio.run(main())
+if sys.version_info >= (3, 12):
+    asyncio.run(main(), loop_factory=loop_factory)
+elif uvloop is not None:
+    uvloop.run(main())
+else:
+    asyncio.run(main())
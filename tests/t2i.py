@@ -1,4 +1,6 @@
 import asyncio
+import os
+import sys
 
 import picwish
 from picwish import PicWish
@@ -6,55 +8,117 @@ from picwish.enums import T2IQuality, T2ITheme, T2ISize
 
 print(picwish.__version__)
 
-picwish = PicWish()
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
+# libuv-based event loop, where available
+loop_factory = uvloop.new_event_loop if uvloop is not None else None
 
-async def generate(output, *args, **kwargs):
+# How many generations and downloads run at once
+concurrency = int(os.environ.get('PICWISH_CONCURRENCY', 8))
+download_concurrency = int(os.environ.get('PICWISH_DOWNLOAD_CONCURRENCY', 4))
+
+
+def job(*args, **kwargs):
+    return args, kwargs
+
+
+async def generate(client, download_queue, output, *args, **kwargs):
     print('Generating: ', args, kwargs)
-    results = await picwish.text_to_image(*args, **kwargs)
+    results = await client.text_to_image(*args, **kwargs)
+    # Hand the images to the downloaders so the worker can start the next generation
     for n, i in enumerate(results):
-        await i.download(f'{n}_{output}')
+        download_queue.put_nowait((i, f'{n}_{output}'))
+
+
+async def worker(client, queue, download_queue):
+    while True:
+        args, kwargs = await queue.get()
+        try:
+            await generate(client, download_queue, *args, **kwargs)
+        except Exception as e:
+            print(f'Failed: {args[0]}: {e!r}')
+        finally:
+            queue.task_done()
+
+
+async def downloader(download_queue):
+    while True:
+        result, output = await download_queue.get()
+        try:
+            await result.download(output)
+        except Exception as e:
+            print(f'Failed to download: {output}: {e!r}')
+        finally:
+            download_queue.task_done()
 
 
 async def main():
     prompt = 'a cat'
-    await generate('1.jpg', prompt, theme=T2ITheme.ANIME, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('2.jpg', prompt, theme=T2ITheme.DIGITAL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('3.jpg', prompt, theme=T2ITheme._3D, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('4.jpg', prompt, theme=T2ITheme.PHOTOGRAPHY, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('5.jpg', prompt, theme=T2ITheme.ANIME, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('6.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('7.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('8.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('9.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('a.jpg', prompt, theme=T2ITheme.PIXEL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('b.jpg', prompt, theme=T2ITheme.ILLUSTRATION, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-    # await generate('c.jpg', prompt, theme=T2ITheme.SKETCH, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1)
-
-    await generate('d.jpg', prompt, theme=T2ITheme.GENERAL, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('e.jpg', prompt, theme=T2ITheme.DIGITAL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('f.jpg', prompt, theme=T2ITheme._3D, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('10.jpg', prompt, theme=T2ITheme.PHOTOGRAPHY, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('11.jpg', prompt, theme=T2ITheme.ANIME, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('12.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('13.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('14.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('15.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('16.jpg', prompt, theme=T2ITheme.PIXEL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('17.jpg', prompt, theme=T2ITheme.ILLUSTRATION, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-    # await generate('18.jpg', prompt, theme=T2ITheme.SKETCH, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1)
-
-    await generate('19.jpg', prompt, theme=T2ITheme.GENERAL, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-    # await generate('1a.jpg', prompt, theme=T2ITheme.DIGITAL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1, negative_prompt=prompt)
-    # await generate('1b.jpg', prompt, theme=T2ITheme._3D, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-    # await generate('1c.jpg', prompt, theme=T2ITheme.PHOTOGRAPHY, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-    # await generate('1d.jpg', prompt, theme=T2ITheme.ANIME, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-    # await generate('1e.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-    # await generate('1f.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-    # await generate('20.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-    # await generate('21.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-    # await generate('23.jpg', prompt, theme=T2ITheme.PIXEL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-    # await generate('24.jpg', prompt, theme=T2ITheme.ILLUSTRATION, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-    # await generate('25.jpg', prompt, theme=T2ITheme.SKETCH, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt)
-
-asyncio.run(main())
+    jobs = [
+        job('1.jpg', prompt, theme=T2ITheme.ANIME, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('2.jpg', prompt, theme=T2ITheme.DIGITAL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('3.jpg', prompt, theme=T2ITheme._3D, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('4.jpg', prompt, theme=T2ITheme.PHOTOGRAPHY, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('5.jpg', prompt, theme=T2ITheme.ANIME, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('6.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('7.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('8.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('9.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('a.jpg', prompt, theme=T2ITheme.PIXEL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('b.jpg', prompt, theme=T2ITheme.ILLUSTRATION, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+        # job('c.jpg', prompt, theme=T2ITheme.SKETCH, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1),
+
+        job('d.jpg', prompt, theme=T2ITheme.GENERAL, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('e.jpg', prompt, theme=T2ITheme.DIGITAL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('f.jpg', prompt, theme=T2ITheme._3D, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('10.jpg', prompt, theme=T2ITheme.PHOTOGRAPHY, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('11.jpg', prompt, theme=T2ITheme.ANIME, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('12.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('13.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('14.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('15.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('16.jpg', prompt, theme=T2ITheme.PIXEL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('17.jpg', prompt, theme=T2ITheme.ILLUSTRATION, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+        # job('18.jpg', prompt, theme=T2ITheme.SKETCH, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1),
+
+        job('19.jpg', prompt, theme=T2ITheme.GENERAL, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+        # job('1a.jpg', prompt, theme=T2ITheme.DIGITAL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.LOW, batch_size=1, negative_prompt=prompt),
+        # job('1b.jpg', prompt, theme=T2ITheme._3D, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+        # job('1c.jpg', prompt, theme=T2ITheme.PHOTOGRAPHY, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+        # job('1d.jpg', prompt, theme=T2ITheme.ANIME, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+        # job('1e.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+        # job('1f.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+        # job('20.jpg', prompt, theme=T2ITheme.CYBERPUNK, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+        # job('21.jpg', prompt, theme=T2ITheme.PAINTING, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+        # job('23.jpg', prompt, theme=T2ITheme.PIXEL_ART, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+        # job('24.jpg', prompt, theme=T2ITheme.ILLUSTRATION, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+        # job('25.jpg', prompt, theme=T2ITheme.SKETCH, size=T2ISize.FHD_16_9, quality=T2IQuality.HIGH, batch_size=1, negative_prompt=prompt),
+    ]
+    queue = asyncio.Queue()
+    for j in jobs:
+        queue.put_nowait(j)
+    download_queue = asyncio.Queue()
+
+    # One client, and so one connection pool, serves every request
+    async with PicWish() as client:
+        # Variants are independent, so a pool of workers generates them concurrently
+        # while another pool downloads the finished images
+        workers = [
+            asyncio.ensure_future(worker(client, queue, download_queue))
+            for _ in range(min(concurrency, len(jobs)))
+        ]
+        workers += [asyncio.ensure_future(downloader(download_queue)) for _ in range(download_concurrency)]
+        await queue.join()
+        await download_queue.join()
+        for w in workers:
+            w.cancel()
+
+if sys.version_info >= (3, 12):
+    asyncio.run(main(), loop_factory=loop_factory)
+elif uvloop is not None:
+    uvloop.run(main())
+else:
+    asyncio.run(main())
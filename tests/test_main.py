@@ -0,0 +1,272 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from contextlib import aclosing
+from unittest import mock
+
+import httpx
+
+from picwish import PicWish, PicwishError, T2IQuality
+from picwish.main import API
+
+
+class BoundedMapTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.picwish = PicWish(retry_after=0.01)
+
+    async def asyncTearDown(self) -> None:
+        await self.picwish.aclose()
+
+    async def test_rate_limited_last_worker_retries_in_place(self) -> None:
+        attempts = {'a': 0, 'b': 0}
+
+        async def func(source: str) -> str:
+            attempts[source] += 1
+            if source == 'b' and attempts[source] == 1:
+                await asyncio.sleep(0.01)
+                raise PicwishError('Too Many Requests', '', status_code=429)
+            return source
+
+        results = await asyncio.wait_for(self.picwish._map(func, ['a', 'b'], 2, {}), 5)
+        self.assertEqual(results, ['a', 'b'])
+        self.assertEqual(attempts, {'a': 1, 'b': 2})
+
+    async def test_rate_limit_error_surfaces_after_retries(self) -> None:
+        async def func(source: str) -> str:
+            raise PicwishError('Too Many Requests', '', status_code=429)
+
+        self.picwish.api.max_retries = 1
+        with self.assertRaises(PicwishError):
+            await asyncio.wait_for(self.picwish._map(func, ['a', 'b'], 2, {}), 5)
+
+    async def test_non_positive_concurrency_is_rejected(self) -> None:
+        async def func(source: str) -> str:
+            return source
+
+        with self.assertRaises(ValueError):
+            await asyncio.wait_for(self.picwish._map(func, ['a'], 0, {}), 5)
+
+    async def test_early_close_cancels_workers(self) -> None:
+        started = []
+        cancelled = []
+
+        async def func(source: str) -> str:
+            if source == 'a':
+                return source
+            started.append(source)
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(source)
+                raise
+            return source
+
+        async with aclosing(self.picwish._bounded_map(func, ['a', 'b', 'c'], 3, {})) as results:
+            async for result in results:
+                self.assertEqual(result, 'a')
+                break
+        self.assertEqual(sorted(cancelled), sorted(started))
+        self.assertTrue(cancelled)
+
+
+class TextToImageBatchTest(unittest.IsolatedAsyncioTestCase):
+    async def test_overflowing_batch_is_flushed(self) -> None:
+        picwish = PicWish(text_to_image_batch_window=0.05)
+        generated = []
+
+        async def generate_images(configs: dict, max_attempts: int) -> list[int]:
+            generated.append(configs['batch_size'])
+            return list(range(configs['batch_size']))
+
+        picwish._generate_images = generate_images
+        try:
+            results = await asyncio.wait_for(asyncio.gather(
+                picwish.text_to_image('cat', batch_size=3),
+                picwish.text_to_image('cat', batch_size=2),
+                picwish.text_to_image('cat', batch_size=1)
+            ), 5)
+            # Let the stale timer of the first batch fire
+            await asyncio.sleep(0.1)
+        finally:
+            await picwish.aclose()
+        self.assertEqual([len(images) for images in results], [3, 2, 1])
+        self.assertEqual(generated, [3, 3])
+        self.assertEqual(picwish._text_to_image_batches, {})
+
+    async def test_short_batch_fails_every_request(self) -> None:
+        picwish = PicWish(text_to_image_batch_window=0.01)
+
+        async def generate_images(configs: dict, max_attempts: int) -> list[int]:
+            return [0]
+
+        picwish._generate_images = generate_images
+        try:
+            results = await asyncio.wait_for(asyncio.gather(
+                picwish.text_to_image('cat', batch_size=1),
+                picwish.text_to_image('cat', batch_size=1),
+                return_exceptions=True
+            ), 5)
+        finally:
+            await picwish.aclose()
+        self.assertIsInstance(results[0], PicwishError)
+        self.assertIsInstance(results[1], PicwishError)
+
+    async def test_cancelled_batch_fails_every_request(self) -> None:
+        picwish = PicWish(text_to_image_batch_window=0.01)
+
+        async def generate_images(configs: dict, max_attempts: int) -> list[int]:
+            raise asyncio.CancelledError
+
+        picwish._generate_images = generate_images
+        try:
+            results = await asyncio.wait_for(asyncio.gather(
+                picwish.text_to_image('cat', batch_size=1),
+                picwish.text_to_image('cat', batch_size=1),
+                return_exceptions=True
+            ), 5)
+        finally:
+            await picwish.aclose()
+        self.assertIsInstance(results[0], asyncio.CancelledError)
+        self.assertIsInstance(results[1], asyncio.CancelledError)
+
+    async def test_aclose_cancels_running_batches(self) -> None:
+        picwish = PicWish(text_to_image_batch_window=0.01)
+        started = asyncio.Event()
+
+        async def generate_images(configs: dict, max_attempts: int) -> list[int]:
+            started.set()
+            await asyncio.sleep(60)
+            return [0]
+
+        picwish._generate_images = generate_images
+        request = asyncio.ensure_future(picwish.text_to_image('cat', batch_size=1))
+        await asyncio.wait_for(started.wait(), 5)
+        self.assertEqual(len(picwish._background_tasks), 1)
+        await picwish.aclose()
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(request, 5)
+        self.assertEqual(picwish._background_tasks, set())
+
+
+class DeduplicateTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.picwish = PicWish()
+        self.started = asyncio.Event()
+        self.cancelled = asyncio.Event()
+
+    async def asyncTearDown(self) -> None:
+        await self.picwish.aclose()
+
+    async def func(self) -> str:
+        self.started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return 'done'
+
+    async def test_last_cancelled_caller_cancels_call(self) -> None:
+        first = asyncio.ensure_future(self.picwish._deduplicate(('key',), self.func))
+        second = asyncio.ensure_future(self.picwish._deduplicate(('key',), self.func))
+        await self.started.wait()
+        first.cancel()
+        await asyncio.sleep(0)
+        self.assertFalse(self.cancelled.is_set())
+        second.cancel()
+        await asyncio.wait_for(self.cancelled.wait(), 5)
+        self.assertEqual(self.picwish._inflight_results, {})
+
+    async def test_new_caller_after_cancellation_starts_afresh(self) -> None:
+        first = asyncio.ensure_future(self.picwish._deduplicate(('key',), self.func))
+        await self.started.wait()
+        first.cancel()
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(self.picwish._deduplicate(('key',), lambda: asyncio.sleep(0, 'again')))
+        self.assertEqual(await asyncio.wait_for(second, 5), 'again')
+
+
+class TextToImagePollingTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.picwish = PicWish(sleep_duration=0.01)
+        self.waited = []
+
+        async def create_task(*args, **kwargs) -> None:
+            self.created = time.monotonic()
+
+        async def wait(task: None, no_watermark: bool = False) -> dict:
+            self.waited.append(time.monotonic() - self.created)
+            return {'data': {'images': [{'url': 'https://example.com/a.jpg', 'id': 'a'}]}}
+
+        self.picwish._create_task = create_task
+        self.picwish._wait = wait
+
+    async def asyncTearDown(self) -> None:
+        await self.picwish.aclose()
+
+    async def test_first_generation_polls_right_away(self) -> None:
+        await self.picwish.text_to_image('cat', quality=T2IQuality.HIGH)
+        self.assertLess(self.waited[0], 0.01)
+        self.assertIn(T2IQuality.HIGH.value, self.picwish._text_to_image_durations)
+
+    async def test_initial_delay_is_capped(self) -> None:
+        self.picwish._text_to_image_durations[T2IQuality.HIGH.value] = 28.0
+        await asyncio.wait_for(self.picwish.text_to_image('cat', quality=T2IQuality.HIGH), 5)
+        # Half the average, capped at four times the sleep duration
+        self.assertGreaterEqual(self.waited[0], 0.04)
+        self.assertLess(self.waited[0], 1)
+        duration = self.picwish._text_to_image_durations[T2IQuality.HIGH.value]
+        self.assertAlmostEqual(duration, 28.0 * 0.7 + self.waited[0] * 0.3, delta=0.01)
+
+
+class AuthorizationTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_path_uploads_share_one_bulk_request(self) -> None:
+        picwish = PicWish()
+        batches = []
+
+        async def oss_authorizations_bulk(filenames: list[str]) -> list[dict]:
+            batches.append(len(filenames))
+            raise PicwishError('Unauthorized', '', status_code=401)
+
+        picwish.api.oss_authorizations_bulk = oss_authorizations_bulk
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                paths = []
+                for i in range(16):
+                    path = os.path.join(directory, f'{i}.jpg')
+                    with open(path, 'wb') as file:
+                        file.write(bytes([i]))
+                    paths.append(path)
+                stat = os.stat
+
+                def slow_stat(path: str, *args, **kwargs) -> os.stat_result:
+                    if path in paths:
+                        # Stats of different files finish at different times
+                        time.sleep(0.001 * paths.index(path))
+                    return stat(path, *args, **kwargs)
+
+                with mock.patch('os.stat', slow_stat):
+                    await asyncio.wait_for(asyncio.gather(
+                        *(picwish.enhance(path) for path in paths),
+                        return_exceptions=True
+                    ), 5)
+        finally:
+            await picwish.aclose()
+        self.assertEqual(batches, [16])
+
+    async def test_missing_authorization_is_an_error(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={'status': 200, 'data': {'objects': {'a.jpg': 'objects/a.jpg'}}})
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            api = API(http, None)
+            authorizations = await api.oss_authorizations_bulk(['a.jpg'])
+            self.assertEqual(authorizations[0]['data']['objects'], {'a.jpg': 'objects/a.jpg'})
+            with self.assertRaises(PicwishError):
+                await api.oss_authorizations_bulk(['b.jpg'])
+
+
+if __name__ == '__main__':
+    unittest.main()